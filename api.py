@@ -1,8 +1,13 @@
 from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse, PlainTextResponse
-from typing import Optional, Dict, Any
-import random
-from rapidfuzz import fuzz
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from typing import Optional, Dict, Any, Literal, get_args
+import functools
+import gzip
+import hashlib
+import hmac
+import itertools
+import re
+import orjson
 
 # If MCP library is unavailable, stub decorator so deploy still works
 try:
@@ -15,10 +20,126 @@ except ImportError:
         return decorator
     app = FastAPI()
 
+# =========================
+# RESPONSE HELPERS
+# =========================
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+# Routes below return prebuilt responses; any route returning a plain dict goes through orjson
+app.router.default_response_class = ORJSONResponse
+
+COMPRESS_MIN_SIZE = 256
+
+# Compress larger JSON bodies; Brotli (with gzip fallback) when installed
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=COMPRESS_MIN_SIZE)
+except ImportError:
+    from fastapi.middleware.gzip import GZipMiddleware
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=5)
+
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+# Built once and reused across requests. Middleware such as GZip edits the header
+# list it is sent in place, so every send gets its own copy of the headers.
+class StaticResponse(Response):
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": list(self.raw_headers)})
+        await send({"type": "http.response.body", "body": self.body})
+
+# Shared across requests, so any write raises instead of leaking into later replies
+class FrozenDict(dict):
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = pop = popitem = clear = setdefault = _read_only
+
+    # Copies (copy.deepcopy, pickle) come back as ordinary mutable dicts
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+# Nested lists become tuples and nested dicts FrozenDicts; tuples are taken as already frozen
+def freeze(value):
+    if isinstance(value, dict) and not isinstance(value, FrozenDict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+# Only reached for headers carrying parameters; "gzip;q=0" is a refusal, not an offer
+@functools.lru_cache(maxsize=256)
+def gzip_q_allowed(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        if name.strip().lower() != "gzip":
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return True
+        return True
+    return False
+
+# Static payload: encoded and wrapped in a response once at import,
+# still usable as a (read-only) dict by MCP tools
+class Prerendered(FrozenDict):
+    __slots__ = ("body", "response", "gzip_response")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__((key, freeze(value)) for key, value in dict(*args, **kwargs).items())
+        self.body = orjson.dumps(self)
+        self.response = StaticResponse(self.body, media_type="application/json")
+        self.gzip_response = None
+
+    def respond(self, request: Request) -> Response:
+        if len(self.body) < COMPRESS_MIN_SIZE:
+            return self.response
+        accept_encoding = request.headers.get("accept-encoding", "")
+        if "gzip" not in accept_encoding or (";" in accept_encoding and not gzip_q_allowed(accept_encoding)):
+            return self.response
+        if self.gzip_response is None:
+            # Compressed on first use, then reused; the middleware passes already-encoded bodies through
+            self.gzip_response = StaticResponse(
+                gzip.compress(self.body, mtime=0), media_type="application/json",
+                headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+            )
+        return self.gzip_response
+
+# GET payload fixed per deployment: 200 and 304 replies prebuilt with validators
+class CachedJSON:
+    __slots__ = ("etag", "ok", "not_modified")
+
+    def __init__(self, payload: Prerendered):
+        self.etag = '"%s"' % hashlib.blake2b(payload.body, digest_size=8).hexdigest()
+        headers = {"ETag": self.etag, "Cache-Control": STATIC_CACHE_CONTROL}
+        self.ok = StaticResponse(payload.body, media_type="application/json", headers=headers)
+        self.not_modified = StaticResponse(status_code=304, headers=headers)
+
 # =========================
 # CONFIG + DATA
 # =========================
+WELCOME = CachedJSON(Prerendered(message="Welcome to EcoFit Carbon Coach API 🌍💚"))
+MCP_INDEX = CachedJSON(Prerendered(tools=["validate", "carbon_score", "about"]))
+
+ABOUT = Prerendered(
+    name="EcoFit MCP Server",
+    description="Calculate and compare carbon footprints, eco quizzes, and product suggestions."
+)
+
 VALID_TOKENS = {"EcoFitToken12345": "919441391981"}
+TOKEN_BYTES = [(token.encode(), token) for token in VALID_TOKENS]
+TOKEN_RESPONSES = {
+    token: StaticResponse(phone, media_type="text/plain", headers={"Cache-Control": "no-store", "Pragma": "no-cache"})
+    for token, phone in VALID_TOKENS.items()
+}
 
 CO2_FACTORS = {
     "transport": {"Car": 2.3, "Bus": 0.8, "Bicycle": 0.05, "Walking": 0.0, "Electric Scooter": 0.2},
@@ -30,6 +151,31 @@ CO2_FACTORS = {
     "electronics_freq": {"Every year": 2.5, "Every 2-3 years": 1.0, "Rarely": 0.3}
 }
 
+TRANSPORT_OPTIONS = tuple(CO2_FACTORS["transport"])
+SHOPPING_OPTIONS = tuple(CO2_FACTORS["shopping"])
+ELECTRONICS_FREQ_OPTIONS = tuple(CO2_FACTORS["electronics_freq"])
+
+# Answer types for tool schemas, so MCP clients see (and check) the valid options.
+# Spelled out for static type checkers; must list CO2_FACTORS keys in the same order.
+Transport = Literal["Car", "Bus", "Bicycle", "Walking", "Electric Scooter"]
+Shopping = Literal[
+    "Groceries & Food", "Clothing & Fashion", "Electronics & Gadgets",
+    "Home & Living", "Beauty & Personal Care"
+]
+ElectronicsFreq = Literal["Every year", "Every 2-3 years", "Rarely"]
+
+if (get_args(Transport), get_args(Shopping), get_args(ElectronicsFreq)) != (TRANSPORT_OPTIONS, SHOPPING_OPTIONS, ELECTRONICS_FREQ_OPTIONS):
+    raise RuntimeError("Answer Literal types are out of sync with CO2_FACTORS")
+
+QUIZ = Prerendered(
+    intro="🌍 Welcome to EcoFit Carbon Coach!",
+    questions=[
+        {"id": "transport", "text": "Commute method?", "options": TRANSPORT_OPTIONS},
+        {"id": "shopping", "text": "Usual shopping?", "options": SHOPPING_OPTIONS},
+        {"id": "electronics_freq", "text": "Electronics purchase frequency?", "options": ELECTRONICS_FREQ_OPTIONS}
+    ]
+)
+
 UNIQUE_TIPS = {
     "transport": {
         "Car": ["Plan routes to avoid traffic jams!", "Carpool to reduce your footprint."],
@@ -64,118 +210,208 @@ PRODUCT_DB = {
         {"name": "Recycled polyester jacket", "carbon_score": 30, "reason": "Recycled bottles"}]}
 }
 
+# Frozen once here so building a product reply does not re-freeze them per miss
+PRODUCT_ALTERNATIVES = {cat: freeze(entry["alternatives"]) for cat, entry in PRODUCT_DB.items()}
+
 PRODUCT_KEYWORDS = {
     "phone": ["phone", "mobile", "smartphone", "iphone", "android phone", "cellphone"],
     "laptop": ["laptop", "notebook", "macbook", "chromebook", "computer"],
     "clothing": ["clothing", "shirt", "t-shirt", "jacket", "jeans", "dress", "apparel", "garment"]
 }
 
-FALLBACK_MSGS = [
+# One compiled alternation per category: a single C-level scan finds any exact keyword
+KEYWORD_PATTERNS = [
+    (cat, re.compile("|".join(map(re.escape, keywords)))) for cat, keywords in PRODUCT_KEYWORDS.items()
+]
+
+# Flat, index-aligned keyword/category lists so rapidfuzz can scan them in one call
+KEYWORD_LIST = [kw for keywords in PRODUCT_KEYWORDS.values() for kw in keywords]
+KEYWORD_CATEGORIES = [cat for cat, keywords in PRODUCT_KEYWORDS.items() for _ in keywords]
+
+MISSING_ANSWERS = Prerendered(message="Please provide all answers.")
+UNKNOWN_ANSWERS = Prerendered(message="Please pick answers from the quiz options.")
+MISSING_PRODUCT = Prerendered(message="Please provide a product.")
+PRODUCT_TOO_LONG = Prerendered(message="Please use a shorter product name.")
+MISSING_SCORES = Prerendered(message="Please provide both scores.")
+
+# Indexed by sign(my_score - friend_score) + 1
+CHALLENGE_RESULTS = (
+    Prerendered(challenge_result="You are more eco-friendly! 🌟"),
+    Prerendered(challenge_result="Same footprint. 🤝"),
+    Prerendered(challenge_result="Your friend is more eco-conscious. 💪")
+)
+
+FALLBACK_MSGS = (
     "Oops! Please try something else! 😊",
     "Hmm… Could you try another input? 🌱",
     "Still learning that one. Try another?"
-]
+)
+
+# Round-robin over pre-encoded replies; no RNG call on the fallback path
+FALLBACK_REPLIES = itertools.cycle([Prerendered(message=msg) for msg in FALLBACK_MSGS])
 
-def fallback() -> str:
-    return random.choice(FALLBACK_MSGS)
+def fallback() -> Prerendered:
+    return next(FALLBACK_REPLIES)
+
+# Longer names are refused before they can reach (and crowd out) the lru_caches below
+MAX_PRODUCT_LEN = 200
+
+# Expects a normalised (stripped, lowercased) name; see find_category
+@functools.lru_cache(maxsize=4096)
+def match_category(name: str) -> Optional[str]:
+    # Exact keyword hits are the common case and need no fuzzy scoring
+    for cat, pattern in KEYWORD_PATTERNS:
+        if pattern.search(name):
+            return cat
+    # Imported on first fuzzy miss only, keeping the native library off the cold-start path
+    from rapidfuzz import fuzz, process
+    match = process.extractOne(name, KEYWORD_LIST, scorer=fuzz.partial_ratio, processor=None, score_cutoff=80)
+    return KEYWORD_CATEGORIES[match[2]] if match else None
 
 def find_category(name: str) -> Optional[str]:
-    name = name.lower()
-    best_match, high_score = None, 0
-    for cat, keywords in PRODUCT_KEYWORDS.items():
-        for kw in keywords:
-            score = fuzz.partial_ratio(kw, name)
-            if score > high_score and score >= 80:
-                high_score, best_match = score, cat
-    return best_match
+    return match_category(name.strip().lower())
+
+# Whole product replies are memoized too: repeat queries skip matching and encoding
+@functools.lru_cache(maxsize=1024)
+def product_reply(product: str) -> Optional[Prerendered]:
+    category = find_category(product)
+    entry = PRODUCT_DB.get(category)
+    if entry is None:
+        return None
+    return Prerendered(product=product, carbon_score=entry["carbon_score"], alternatives=PRODUCT_ALTERNATIVES[category])
+
+def score_answers(transport: str, shopping: str, electronics_freq: str) -> Prerendered:
+    score = CO2_FACTORS["transport"][transport] + CO2_FACTORS["shopping"][shopping] + CO2_FACTORS["electronics_freq"][electronics_freq]
+    tips = UNIQUE_TIPS["transport"][transport] + UNIQUE_TIPS["shopping"][shopping] + UNIQUE_TIPS["electronics_freq"][electronics_freq]
+    return Prerendered(carbon_score=round(score, 2), praise="Good job!" if score < 4.5 else "Needs improvement!", tips=tips)
+
+# Only 5 x 5 x 3 answer combinations exist, so every calculate result is built up front
+CALC_RESULTS = {
+    answers: score_answers(*answers)
+    for answers in itertools.product(TRANSPORT_OPTIONS, SHOPPING_OPTIONS, ELECTRONICS_FREQ_OPTIONS)
+}
+
+# Returns the configured token the bearer header matches
+def authenticate(authorization: Optional[str]) -> str:
+    # The auth scheme is case-insensitive (RFC 7235), so "bearer x" is accepted too
+    if not authorization or authorization[:7].lower() != "bearer ":
+        raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
+    candidate = authorization[7:].encode()
+    matched = None
+    # Constant-time compare against every token, with no early exit on a hit
+    for known, token in TOKEN_BYTES:
+        if hmac.compare_digest(known, candidate):
+            matched = token
+    if matched is None:
+        raise HTTPException(status_code=403, detail="Invalid token")
+    return matched
+
+def conditional_json(request: Request, cached: CachedJSON) -> Response:
+    # If-None-Match uses weak comparison: each listed tag, or "*", must match exactly
+    for tag in request.headers.get("if-none-match", "").split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == cached.etag:
+            return cached.not_modified
+    return cached.ok
 
 # =========================
 # MCP TOOLS
 # =========================
 @tool(name="validate", description="Validate token and return phone number in {country_code}{number} format.")
 async def validate_tool(authorization: str) -> str:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
-    token = authorization.split(" ")[1]
-    phone = VALID_TOKENS.get(token)
-    if not phone:
-        raise HTTPException(status_code=403, detail="Invalid token")
-    return phone
+    return VALID_TOKENS[authenticate(authorization)]
 
 @tool(name="about", description="Return metadata about this MCP server.")
-async def about_tool() -> Dict[str, str]:
-    return {
-        "name": "EcoFit MCP Server",
-        "description": "Calculate and compare carbon footprints, eco quizzes, and product suggestions."
-    }
+async def about_tool() -> Dict[str, Any]:
+    return ABOUT
 
 @tool(name="carbon_score", description="Handle eco footprint quizzes, calculations, product tips & challenges.")
 async def carbon_score_tool(
     mode: str,
-    transport: Optional[str] = None,
-    shopping: Optional[str] = None,
-    electronics_freq: Optional[str] = None,
+    transport: Optional[Transport] = None,
+    shopping: Optional[Shopping] = None,
+    electronics_freq: Optional[ElectronicsFreq] = None,
     product: Optional[str] = None,
     my_score: Optional[float] = None,
     friend_score: Optional[float] = None
-) -> Any:
+) -> Dict[str, Any]:
     mode = (mode or "").lower()
     if mode == "quiz":
-        return {
-            "intro": "🌍 Welcome to EcoFit Carbon Coach!",
-            "questions": [
-                {"id": "transport", "text": "Commute method?", "options": list(CO2_FACTORS["transport"].keys())},
-                {"id": "shopping", "text": "Usual shopping?", "options": list(CO2_FACTORS["shopping"].keys())},
-                {"id": "electronics_freq", "text": "Electronics purchase frequency?", "options": list(CO2_FACTORS["electronics_freq"].keys())}
-            ]
-        }
+        return QUIZ
     if mode == "calculate":
         if not (transport and shopping and electronics_freq):
-            return {"message": "Please provide all answers."}
-        score = CO2_FACTORS["transport"][transport] + CO2_FACTORS["shopping"][shopping] + CO2_FACTORS["electronics_freq"][electronics_freq]
-        tips = UNIQUE_TIPS["transport"][transport] + UNIQUE_TIPS["shopping"][shopping] + UNIQUE_TIPS["electronics_freq"][electronics_freq]
-        return {"carbon_score": round(score, 2), "praise": "Good job!" if score < 4.5 else "Needs improvement!", "tips": tips}
+            return MISSING_ANSWERS
+        result = CALC_RESULTS.get((transport, shopping, electronics_freq))
+        if result is None:
+            return UNKNOWN_ANSWERS
+        return result
     if mode == "product":
         if not product:
-            return {"message": "Please provide a product."}
-        category = find_category(product)
-        if not category or category not in PRODUCT_DB:
-            return {"message": fallback()}
-        return {
-            "product": product,
-            "carbon_score": PRODUCT_DB[category]["carbon_score"],
-            "alternatives": PRODUCT_DB[category]["alternatives"]
-        }
+            return MISSING_PRODUCT
+        if len(product) > MAX_PRODUCT_LEN:
+            return PRODUCT_TOO_LONG
+        return product_reply(product) or fallback()
     if mode == "challenge":
         if my_score is None or friend_score is None:
-            return {"message": "Please provide both scores."}
-        if my_score < friend_score:
-            return {"challenge_result": "You are more eco-friendly! 🌟"}
-        elif my_score > friend_score:
-            return {"challenge_result": "Your friend is more eco-conscious. 💪"}
-        else:
-            return {"challenge_result": "Same footprint. 🤝"}
-    return {"message": fallback()}
+            return MISSING_SCORES
+        return CHALLENGE_RESULTS[(my_score > friend_score) - (my_score < friend_score) + 1]
+    return fallback()
 
 # =========================
 # REST API ENDPOINTS
 # =========================
 @app.get("/mcp")
-async def mcp_root():
-    return {"tools": ["validate", "carbon_score", "about"]}
+async def mcp_root(request: Request):
+    return conditional_json(request, MCP_INDEX)
 
 @app.post("/mcp/validate", response_class=PlainTextResponse)
 async def validate_rest(authorization: str = Header(None)):
-    return await validate_tool(authorization)
+    return TOKEN_RESPONSES[authenticate(authorization)]
 
 @app.post("/mcp/about")
 async def about_rest():
-    return await about_tool()
+    return ABOUT.response
+
+# JSON types accepted per carbon_score field; other keys are ignored, other types are a 422
+CARBON_SCORE_FIELDS = {
+    "mode": str, "transport": str, "shopping": str, "electronics_freq": str, "product": str,
+    "my_score": (int, float), "friend_score": (int, float)
+}
 
 @app.post("/mcp/carbon_score")
-async def carbon_score_rest(body: dict):
-    return await carbon_score_tool(**body)
+async def carbon_score_rest(request: Request):
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Request body must be valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Request body must be a JSON object")
+    args = {}
+    for key, value in body.items():
+        expected = CARBON_SCORE_FIELDS.get(key)
+        if expected is None or value is None:
+            continue
+        # bool is an int subclass, but true/false is not a score
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise HTTPException(status_code=422, detail=f"Invalid value for '{key}'")
+        args[key] = value
+    if "mode" not in args:
+        raise HTTPException(status_code=422, detail="Request body must include 'mode'")
+    result = await carbon_score_tool(**args)
+    return result.respond(request)
 
 @app.get("/")
-async def root():
-    return {"message": "Welcome to EcoFit Carbon Coach API 🌍💚"}
+async def root(request: Request):
+    return conditional_json(request, WELCOME)
+
+if __name__ == "__main__":
+    import os
+    import uvicorn
+    # Quiet by default; LOG_LEVEL=info (or debug) turns on the access log for local work
+    log_level = os.environ.get("LOG_LEVEL", "warning").lower()
+    # "auto" resolves to uvloop wherever it is installed (everywhere but Windows)
+    uvicorn.run(
+        "api:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8000)),
+        loop="auto", http="httptools", workers=os.cpu_count() or 1,
+        log_level=log_level, access_log=log_level in ("info", "debug", "trace")
+    )